@@ -2,21 +2,33 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 import json
+import hashlib
 import time
 import argparse
+import threading
+from collections import deque
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 from typing import List, Dict, Tuple
-import zhipuai
-import requests
 import logging
-from tqdm import tqdm
 import sys
 
-# 确保使用UTF-8编码，解决中文显示问题
-if sys.stdout.encoding != 'utf-8':
-    sys.stdout = open(sys.stdout.fileno(), mode='w', encoding='utf-8', buffering=1)
-    sys.stderr = open(sys.stderr.fileno(), mode='w', encoding='utf-8', buffering=1)
+# orjson为可选依赖，安装后可加速JSON序列化，未安装时退回标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 确保使用UTF-8编码，解决中文显示问题（保留原有的缓冲方式，不强制行缓冲）
+for stream in (sys.stdout, sys.stderr):
+    try:
+        stream.reconfigure(encoding='utf-8')
+    except AttributeError:
+        pass
 
 # 配置日志系统，记录程序运行过程
 logging.basicConfig(
@@ -26,18 +38,65 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class RolePlayGenerator:
-    def __init__(self, api_key=None):
+    # 限流及临时性错误的退避参数：最多重试次数与退避间隔上限（秒）
+    MAX_RETRIES = 3
+    MAX_INTERVAL = 5.0
+    # 逐句生成对话时随请求发送的历史条数（最近3轮）
+    HISTORY_WINDOW = 6
+    # 从人设中提取角色名称的正则，兼容全角/半角冒号及Markdown加粗；
+    # 标签两侧只匹配同一行内的空白，名称为空时不会误取下一行的内容
+    _NAME_RE = re.compile(r'(?:角色名称|姓名|名称)\**[^\S\n]*[:：][^\S\n]*([^\n]*\S)')
+    # 备用回复，在逐句生成对话的API调用失败时使用
+    DEFAULT_REPLIES = (
+        "你好，很高兴认识你。",
+        "今天天气真不错，不是吗？",
+        "最近过得怎么样？",
+        "我最近在思考一些人生问题。",
+        "有时候我觉得生活充满了惊喜。",
+        "能和你聊天很开心。",
+        "我们下次再聊吧。"
+    )
+    # 角色人设的默认磁盘缓存目录
+    DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "roleplay_profiles")
+    
+    def __init__(self, api_key=None, cache_dir=DEFAULT_CACHE_DIR):
         """
         初始化角色扮演对话生成器
         
         参数:
             api_key: 智谱AI的API密钥，如未提供则尝试从环境变量获取
+            cache_dir: 角色人设的缓存目录，为None时不使用缓存
         """
         self.api_key = api_key or os.environ.get("ZHIPUAI_API_KEY")
         if not self.api_key:
             raise ValueError("需要提供 ZHIPUAI API KEY")
-        # 初始化智谱AI客户端
-        self.client = zhipuai.ZhipuAI(api_key=self.api_key)
+        # zhipuai会连带导入httpx、pydantic等较重的模块，延迟到创建实例时再导入以加快启动
+        import httpx
+        import zhipuai
+        
+        # SDK默认已使用带长连接池的HTTP客户端；仅在安装了h2时换用启用HTTP/2的客户端，
+        # 让并发请求在同一连接上多路复用，否则沿用SDK的默认客户端
+        http_client = None
+        if importlib.util.find_spec("h2") is not None:
+            http_client = httpx.Client(http2=True)
+        # 初始化智谱AI客户端；关闭SDK自带的重试，由 _chat_completion 统一处理
+        # 限流、超时、连接错误和5xx的重试，避免两层重试叠加导致一次调用发出过多请求
+        self.client = zhipuai.ZhipuAI(api_key=self.api_key, http_client=http_client, max_retries=0)
+        # 可重试的网络层异常：SDK包装后的超时/连接错误，以及未被包装的httpx异常
+        self._transient_errors = tuple(
+            error_type for error_type in (
+                getattr(zhipuai, "APITimeoutError", None),
+                getattr(zhipuai, "APIConnectionError", None),
+                httpx.TimeoutException,
+                httpx.TransportError,
+            ) if isinstance(error_type, type)
+        )
+        # 自适应限流状态，仅在服务端返回限流错误后才拉开调用间隔
+        self._min_interval = 0.0
+        self._last_call_ts = 0.0
+        self._blocked_until = 0.0  # 限流后在此时间点之前不发出新的调用
+        self._rate_lock = threading.Lock()
+        self.cache_dir = cache_dir
 
     def generate_character_profile(self, text: str, character_name=None) -> str:
         """
@@ -52,18 +111,8 @@ class RolePlayGenerator:
         """
         logger.info("正在根据文本生成角色人设...")
         
-        # 创建一个备用的角色人设模板，当API调用失败时使用
-        fallback_name = character_name or '默认角色'
-        fallback_profile = f"""
-角色名称：{fallback_name}
-年龄：30岁
-性别：未知
-外貌特征：普通外表
-性格特点：平和、友善
-说话风格：平实、客观
-背景故事：普通人的生活经历
-行为方式：正常社交行为
-        """
+        model = "chatglm_turbo"
+        temperature = 0.7
         
         # 构建提示词，根据是否指定角色名称调整指令
         name_instruction = ""
@@ -88,26 +137,102 @@ class RolePlayGenerator:
 
 请以结构化的格式输出完整的角色人设："""
 
+        # 指定了角色名称时，相同的完整提示词和模型参数会得到可复用的人设，优先读取缓存；
+        # 未指定名称时由模型自行创建角色，同一文本的多次调用应得到不同角色，因此不使用缓存
+        cache_key = None
+        if character_name:
+            cache_key = hashlib.sha256(f"{model}|{temperature}|{prompt}".encode('utf-8')).hexdigest()
+            cached_profile = self._load_cached_profile(cache_key)
+            if cached_profile is not None:
+                logger.info("使用缓存的角色人设")
+                return cached_profile
+
         try:
             # 调用智谱AI的ChatGLM模型生成角色人设
-            response = self.client.chat.completions.create(
-                model="chatglm_turbo",
+            response = self._chat_completion(
+                model=model,
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,  # 控制生成内容的随机性
+                temperature=temperature,  # 控制生成内容的随机性
                 top_p=0.9,        # 控制词汇分布的采样范围
             )
             
             # 从API响应中提取生成的内容
             character_profile = response.choices[0].message.content
             logger.info("角色人设生成成功")
+            # 只缓存生成成功的人设，备用人设不写入缓存
+            if cache_key:
+                self._save_cached_profile(cache_key, character_profile)
             return character_profile
         except Exception as e:
             # 异常处理，返回备用人设
             logger.error(f"生成角色人设失败: {str(e)}")
+            # 只在失败时才构建备用的角色人设模板
+            fallback_name = character_name or '默认角色'
+            fallback_profile = f"""
+角色名称：{fallback_name}
+年龄：30岁
+性别：未知
+外貌特征：普通外表
+性格特点：平和、友善
+说话风格：平实、客观
+背景故事：普通人的生活经历
+行为方式：正常社交行为
+        """
             return fallback_profile
 
+    def _load_cached_profile(self, cache_key: str):
+        """
+        从磁盘缓存中读取角色人设
+        
+        参数:
+            cache_key: 缓存键
+            
+        返回:
+            str: 缓存的角色人设，未启用缓存或未命中时返回None
+        """
+        if not self.cache_dir:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir, f"{cache_key}.txt"), 'r', encoding='utf-8') as f:
+                profile = f.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            # 缓存文件损坏或编码错误时视为未命中，不影响正常生成
+            logger.warning(f"读取人设缓存失败: {str(e)}")
+            return None
+        # 空文件不是有效的人设，同样视为未命中
+        return profile or None
+    
+    def _save_cached_profile(self, cache_key: str, profile: str):
+        """
+        将角色人设写入磁盘缓存
+        
+        参数:
+            cache_key: 缓存键
+            profile: 角色人设文本
+        """
+        # 只缓存非空的文本人设
+        if not self.cache_dir or not (isinstance(profile, str) and profile):
+            return
+        cache_file = os.path.join(self.cache_dir, f"{cache_key}.txt")
+        # 先写临时文件再替换，避免并发生成时读到写了一半的缓存
+        tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(profile)
+            os.replace(tmp_file, cache_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"写入人设缓存失败: {str(e)}")
+            # 清理写入失败时残留的临时文件
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+
     def generate_dialogue(self, character1: str, character2: str, num_turns: int = 5, init_prompt: str = None) -> List[Dict]:
         """
         生成两个角色之间的对话
@@ -123,13 +248,15 @@ class RolePlayGenerator:
         """
         logger.info(f"开始生成 {num_turns} 轮对话...")
         
+        # 回合数不为正数时无需调用API
+        if num_turns <= 0:
+            logger.warning(f"对话回合数为 {num_turns}，不生成对话")
+            return []
+        
         # 如果未提供初始场景，使用默认场景
         if not init_prompt:
             init_prompt = "你们偶然在咖啡店相遇，开始一段对话。"
         
-        dialogues = []  # 存储生成的对话
-        history = []    # 存储对话历史，用于API调用
-        
         # 构建系统提示词，用于指导模型生成对话
         system_prompt = f"""你将模拟两个角色之间的对话。这些角色是：
         
@@ -139,84 +266,321 @@ class RolePlayGenerator:
 
 初始场景: {init_prompt}
 
-请生成角色之间的对话，确保每个角色的回应符合其人设。每次只需要生成一个角色的一句话。"""
-        
-        # 定义备用回复，在API调用失败时使用
-        default_replies = [
-            "你好，很高兴认识你。",
-            "今天天气真不错，不是吗？",
-            "最近过得怎么样？",
-            "我最近在思考一些人生问题。",
-            "有时候我觉得生活充满了惊喜。",
-            "能和你聊天很开心。",
-            "我们下次再聊吧。"
+请生成角色之间的对话，确保每个角色的回应符合其人设。"""
+        
+        # system消息只构建一次，并在所有调用中保持逐字节一致，
+        # 使服务端可以复用这段长前缀的上下文缓存；随轮次变化的指令一律放在user消息中
+        system_message = {"role": "system", "content": system_prompt}
+        
+        # 优先在一次API调用中生成全部对话，失败时退回逐句生成
+        dialogues = self._generate_dialogue_batch(system_message, num_turns)
+        if dialogues is None:
+            dialogues = self._generate_dialogue_by_turn(system_message, num_turns)
+        
+        logger.info(f"成功生成 {len(dialogues)} 条对话")
+        return dialogues
+
+    def _generate_dialogue_batch(self, system_message: Dict, num_turns: int):
+        """
+        在一次API调用中生成全部回合的对话
+        
+        参数:
+            system_message: 描述角色与场景的system消息
+            num_turns: 生成对话的回合数
+            
+        返回:
+            List[Dict]: 生成的对话列表，调用或解析失败时返回None
+        """
+        num_lines = num_turns * 2
+        prompt = f"""请一次性生成恰好{num_turns}轮对话（共{num_lines}句），从角色1开始，角色1和角色2交替发言，每句只包含一个角色的一句话。
+请只输出一个JSON数组，不要输出其他内容，格式如下：
+[{{"role": "角色1", "content": "..."}}, {{"role": "角色2", "content": "..."}}, ...]"""
+        
+        try:
+            # 调用智谱AI的ChatGLM模型一次生成全部对话
+            response = self._chat_completion(
+                model="chatglm_turbo",
+                messages=[
+                    system_message,
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.8,
+                top_p=0.9,
+            )
+            content = response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"批量生成对话失败: {str(e)}")
+            return None
+        
+        dialogues = self._parse_dialogue_json(content, num_lines)
+        if dialogues is None:
+            logger.warning("批量生成的对话格式不正确，改为逐句生成")
+        return dialogues
+
+    @staticmethod
+    def _parse_dialogue_json(content: str, num_lines: int):
+        """
+        解析模型输出的JSON对话数组
+        
+        参数:
+            content: 模型返回的文本
+            num_lines: 期望的对话句数
+            
+        返回:
+            List[Dict]: 解析出的对话列表，格式不符合要求时返回None
+        """
+        # 接口可能返回空内容，此时交给逐句生成处理
+        if not isinstance(content, str):
+            return None
+        # 模型可能用代码块包裹输出，只截取最外层的JSON数组
+        start = content.find("[")
+        end = content.rfind("]")
+        if start == -1 or end <= start:
+            return None
+        try:
+            items = json.loads(content[start:end + 1])
+        except ValueError:
+            return None
+        if not isinstance(items, list) or len(items) < num_lines:
+            return None
+        
+        items = items[:num_lines]
+        # 要求角色严格交替且内容为字符串
+        roles = ("角色1", "角色2")
+        if not all(
+            isinstance(item, dict) and item.get("role") == roles[index % 2] and isinstance(item.get("content"), str)
+            for index, item in enumerate(items)
+        ):
+            return None
+        # 校验通过后一次性构建结果列表，只保留角色和内容两个字段
+        return [{"role": item["role"], "content": item["content"]} for item in items]
+
+    def _generate_dialogue_by_turn(self, system_message: Dict, num_turns: int) -> List[Dict]:
+        """
+        逐句调用API生成对话，作为批量生成失败时的备用方案
+        
+        参数:
+            system_message: 描述角色与场景的system消息
+            num_turns: 生成对话的回合数
+            
+        返回:
+            List[Dict]: 生成的对话列表，每项包含角色和对话内容
+        """
+        # 进度条只在逐句生成时使用，按需导入
+        from tqdm import tqdm
+        
+        dialogues = []  # 存储生成的对话
+        # 存储对话历史，用于API调用；只保留会随请求发送的最近几条
+        history = deque(maxlen=self.HISTORY_WINDOW)
+        
+        # 循环中不变的内容预先构建，按角色编号（1、2）索引：角色标签、提示词和下一位发言的角色
+        role_labels = [None, "角色1", "角色2"]
+        first_prompt = "请扮演角色1，生成角色1的第一句对话。每次只需要生成一个角色的一句话。"
+        next_prompts = [None] + [
+            f"请扮演角色{i}，根据上下文生成角色{i}的下一句对话。每次只需要生成一个角色的一句话。"
+            for i in (1, 2)
         ]
+        next_character = [None, 2, 1]
         
         # 交替生成两个角色的对话
         current_character = 1  # 从角色1开始
+        last_turn = num_turns * 2 - 1  # 最后一句之后不再有请求，无需记录历史
         
         try:
-            # 使用tqdm显示进度条
-            for turn in tqdm(range(num_turns * 2)):
-                # 构建提示词，根据是第一轮还是后续轮次调整
-                if turn == 0:
-                    prompt = f"请生成角色1的第一句对话。"
-                else:
-                    prompt = f"请根据上下文，生成角色{current_character}的下一句对话。"
-                
-                # 将用户提示添加到历史中
-                history.append({"role": "user", "content": prompt})
+            # 使用tqdm显示进度条；每轮都是耗时的网络调用，降低刷新频率，非终端环境下直接关闭
+            for turn in tqdm(range(num_turns * 2), mininterval=2.0, disable=not sys.stderr.isatty()):
+                # 选择提示词，根据是第一轮还是后续轮次调整，当前扮演的角色在这里说明
+                prompt = first_prompt if turn == 0 else next_prompts[current_character]
+                role = role_labels[current_character]
+                streamed = False  # 本轮是否已经开始在终端输出回复
                 
                 try:
                     # 调用智谱AI的ChatGLM模型生成对话
-                    response = self.client.chat.completions.create(
+                    response = self._chat_completion(
                         model="chatglm_turbo",
                         messages=[
-                            # 在system提示中说明当前应该扮演哪个角色
-                            {"role": "system", "content": f"{system_prompt}\n当前请扮演角色{current_character}，根据对话历史生成下一句话。"},
-                            # 包含之前的对话历史
-                            *history
+                            # 固定不变的system消息作为可缓存的前缀
+                            system_message,
+                            # 只发送最近几轮的对话历史，避免请求体随轮次二次增长
+                            *history,
+                            # 本轮的提示只随当前请求发送，不计入历史
+                            {"role": "user", "content": prompt}
                         ],
                         temperature=0.8,  # 增加随机性，使对话更多样化
                         top_p=0.9,
+                        stream=True,      # 流式返回，边生成边输出
                     )
                     
-                    # 从API响应中提取生成的内容
-                    reply = response.choices[0].message.content
+                    # 逐块接收生成的内容并实时输出，最后一次性拼接；
+                    # 输出期间暂时清除进度条，整句输出完毕后再重绘，避免进度条覆盖回复内容
+                    reply_parts = []
+                    with tqdm.external_write_mode():
+                        streamed = True
+                        sys.stdout.write(f"{role}: ")
+                        try:
+                            for chunk in response:
+                                delta = chunk.choices[0].delta.content if chunk.choices else None
+                                if delta:
+                                    reply_parts.append(delta)
+                                    sys.stdout.write(delta)
+                                    sys.stdout.flush()
+                        finally:
+                            # 即使流式输出中断也先换行，避免进度条重绘时覆盖已输出的内容
+                            sys.stdout.write("\n")
+                            sys.stdout.flush()
+                    reply = "".join(reply_parts)
                     
                     # 记录对话
                     dialogues.append({
-                        "role": f"角色{current_character}",
+                        "role": role,
                         "content": reply
                     })
                     
                     # 更新历史，添加模型的回复
-                    history.append({"role": "assistant", "content": reply})
+                    if turn < last_turn:
+                        history.append({"role": "assistant", "content": reply})
                     
                     # 切换角色，实现交替对话
-                    current_character = 2 if current_character == 1 else 1
-                    
-                    # 防止API限流，添加延迟
-                    time.sleep(1)
+                    current_character = next_character[current_character]
                 except Exception as e:
                     # 异常处理，使用备用回复
                     logger.error(f"对话生成失败: {str(e)}")
                     # 使用预定义的回复列表，根据当前轮次选择不同回复
-                    default_reply = default_replies[turn % len(default_replies)]
+                    default_reply = self.DEFAULT_REPLIES[turn % len(self.DEFAULT_REPLIES)]
+                    if streamed:
+                        # 终端上已输出了不完整的回复，说明保存的内容已替换为备用回复
+                        tqdm.write(f"（{role}的回复生成中断，已替换为备用回复）{role}: {default_reply}")
                     dialogues.append({
-                        "role": f"角色{current_character}",
+                        "role": role,
                         "content": default_reply
                     })
-                    history.append({"role": "assistant", "content": default_reply})
-                    current_character = 2 if current_character == 1 else 1
-                    time.sleep(1)
+                    if turn < last_turn:
+                        history.append({"role": "assistant", "content": default_reply})
+                    current_character = next_character[current_character]
         except Exception as e:
             # 整体异常处理
             logger.error(f"生成对话时出错: {str(e)}")
         
-        logger.info(f"成功生成 {len(dialogues)} 条对话")
         return dialogues
 
+    def _chat_completion(self, **kwargs):
+        """
+        调用智谱AI对话接口，遇到限流或临时性错误时退避并重试
+        
+        参数:
+            **kwargs: 传递给 chat.completions.create 的参数
+            
+        返回:
+            API响应对象
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            self._wait_for_rate_limit()
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                status_code = self._get_status_code(e)
+                is_rate_limit = self._is_rate_limit_error(e)
+                is_transient = (
+                    isinstance(e, self._transient_errors)
+                    or (status_code is not None and status_code >= 500)
+                )
+                if not (is_rate_limit or is_transient) or attempt == self.MAX_RETRIES:
+                    raise
+                # 退避时间从本次失败返回的时刻起算，服务端给出Retry-After时以其为准
+                retry_after = self._get_retry_after(e)
+                backoff = min(0.5 * 2 ** attempt, self.MAX_INTERVAL)
+                if is_rate_limit:
+                    # 触发限流时指数增加调用间隔，并让所有调用在等待期结束前暂停
+                    with self._rate_lock:
+                        self._min_interval = min(max(self._min_interval * 2, 0.5), self.MAX_INTERVAL)
+                        delay = max(self._min_interval, retry_after or 0.0)
+                        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                    logger.warning(f"触发API限流，{delay:.1f}秒后重试: {str(e)}")
+                else:
+                    # 超时、连接错误和5xx只影响本次调用，不调整全局调用间隔
+                    delay = max(backoff, retry_after or 0.0)
+                    logger.warning(f"API调用出错，{delay:.1f}秒后重试: {str(e)}")
+                    time.sleep(delay)
+                continue
+            # 调用成功时逐步将调用间隔衰减回0
+            with self._rate_lock:
+                self._min_interval = self._min_interval / 2 if self._min_interval > 0.1 else 0.0
+            return response
+    
+    def _wait_for_rate_limit(self):
+        """
+        按当前的最小调用间隔及限流等待期等待，未触发过限流时不会等待
+        """
+        with self._rate_lock:
+            now = time.monotonic()
+            target = max(self._last_call_ts + self._min_interval, self._blocked_until)
+            wait = max(0.0, target - now)
+            # 预先占用下一次调用的时间点，保证并发调用之间也保持间隔
+            self._last_call_ts = now + wait
+        if wait > 0:
+            time.sleep(wait)
+    
+    @staticmethod
+    def _get_status_code(error: Exception):
+        """
+        获取异常对应的HTTP状态码
+        
+        参数:
+            error: API调用抛出的异常
+            
+        返回:
+            int: HTTP状态码，异常不包含状态码时返回None
+        """
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            status_code = getattr(getattr(error, "response", None), "status_code", None)
+        return status_code
+    
+    @staticmethod
+    def _get_retry_after(error: Exception):
+        """
+        从异常的HTTP响应头中读取服务端建议的重试等待时间
+        
+        参数:
+            error: API调用抛出的异常
+            
+        返回:
+            float: 等待秒数（最多60秒），响应头不存在或无法解析时返回None
+        """
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if not headers:
+            return None
+        try:
+            if headers.get("retry-after-ms"):
+                seconds = float(headers["retry-after-ms"]) / 1000
+            elif headers.get("retry-after"):
+                seconds = float(headers["retry-after"])
+            else:
+                return None
+        except (TypeError, ValueError):
+            # Retry-After也可能是HTTP日期格式，此时交给默认退避策略处理
+            return None
+        return min(max(seconds, 0.0), 60.0)
+    
+    @classmethod
+    def _is_rate_limit_error(cls, error: Exception) -> bool:
+        """
+        判断异常是否为服务端的限流错误（HTTP 429）
+        
+        参数:
+            error: API调用抛出的异常
+            
+        返回:
+            bool: 是否为限流错误
+        """
+        status_code = cls._get_status_code(error)
+        # 有HTTP状态码时只以状态码为准
+        if status_code is not None:
+            return status_code == 429
+        # 没有状态码时（如SDK包装过的异常）再根据错误信息判断
+        message = str(error).lower()
+        return any(keyword in message for keyword in ("429", "rate limit", "限流", "频率", "并发"))
+
     def save_dialogue(self, dialogues: List[Dict], character1: str, character2: str, output_dir: str = "outputs"):
         """
         保存生成的对话到文件
@@ -228,8 +592,7 @@ class RolePlayGenerator:
             output_dir: 输出目录
         """
         # 确保输出目录存在
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
             
         # 使用时间戳作为文件名，确保唯一性
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -255,32 +618,69 @@ class RolePlayGenerator:
             "dialogues": dialogues
         }
         
-        # 保存为JSON格式
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            
-        logger.info(f"对话已保存到 {output_file}")
-        
         # 同时保存一个易于阅读的文本版本
         txt_output_file = os.path.join(output_dir, f"dialogue_{timestamp}.txt")
-        with open(txt_output_file, 'w', encoding='utf-8') as f:
-            # 写入角色信息
-            f.write(f"角色1 ({char1_name}):\n{character1}\n\n")
-            f.write(f"角色2 ({char2_name}):\n{character2}\n\n")
-            f.write("="*50 + "\n对话内容\n" + "="*50 + "\n\n")
-            
-            # 写入对话内容，替换角色编号为角色名称
-            for dialogue in dialogues:
-                role = dialogue["role"]
-                # 替换角色名
-                if role == "角色1":
-                    role = char1_name
-                elif role == "角色2":
-                    role = char2_name
-                    
-                f.write(f"{role}: {dialogue['content']}\n\n")
-                
-        logger.info(f"对话文本版本已保存到 {txt_output_file}")
+        
+        # 两个文件互不依赖，在后台线程中并行写入
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            json_future = executor.submit(self._write_json, output_file, data)
+            txt_future = executor.submit(
+                self._write_txt, txt_output_file, dialogues,
+                character1, character2, char1_name, char2_name
+            )
+            # 获取结果，使写入时的异常能够正常抛出
+            json_future.result()
+            logger.info(f"对话已保存到 {output_file}")
+            txt_future.result()
+            logger.info(f"对话文本版本已保存到 {txt_output_file}")
+    
+    @staticmethod
+    def _write_json(output_file: str, data: Dict):
+        """
+        将对话数据保存为JSON格式
+        
+        参数:
+            output_file: 输出文件路径
+            data: 对话数据
+        """
+        if orjson is not None:
+            # orjson直接输出UTF-8字节，无需逐字符转义
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+    
+    @staticmethod
+    def _write_txt(output_file: str, dialogues: List[Dict], character1: str, character2: str, char1_name: str, char2_name: str):
+        """
+        将对话保存为易于阅读的文本格式
+        
+        参数:
+            output_file: 输出文件路径
+            dialogues: 对话列表
+            character1: 第一个角色的人设
+            character2: 第二个角色的人设
+            char1_name: 第一个角色的名称
+            char2_name: 第二个角色的名称
+        """
+        # 角色信息
+        header = (
+            f"角色1 ({char1_name}):\n{character1}\n\n"
+            f"角色2 ({char2_name}):\n{character2}\n\n"
+            + "="*50 + "\n对话内容\n" + "="*50 + "\n\n"
+        )
+        
+        # 对话内容，通过映射表将角色编号替换为角色名称
+        name_map = {"角色1": char1_name, "角色2": char2_name}
+        body = "".join(
+            f"{name_map.get(dialogue['role'], dialogue['role'])}: {dialogue['content']}\n\n"
+            for dialogue in dialogues
+        )
+        
+        # 一次性写入整个文件
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(header + body)
     
     def _extract_character_name(self, profile: str) -> str:
         """
@@ -292,16 +692,9 @@ class RolePlayGenerator:
         返回:
             str: 提取出的角色名称，如果提取失败则返回"未知角色"
         """
-        try:
-            # 尝试查找"角色名称"或"名称"或"姓名"后面的内容
-            lines = profile.split('\n')
-            for line in lines:
-                if "角色名称" in line or "名称" in line or "姓名" in line:
-                    return line.split("：")[-1].strip()
-            # 如果找不到，返回默认名称
-            return "未知角色"
-        except:
-            return "未知角色"
+        # 查找"角色名称"或"名称"或"姓名"后面的内容，找不到则返回默认名称
+        match = self._NAME_RE.search(profile)
+        return match.group(1).strip() if match else "未知角色"
 
 def main():
     """
@@ -318,6 +711,7 @@ def main():
     parser.add_argument("--turns", type=int, default=5, help="对话回合数")
     parser.add_argument("--init_prompt", type=str, help="对话初始提示")
     parser.add_argument("--output_dir", type=str, default="outputs", help="输出目录")
+    parser.add_argument("--no_cache", action="store_true", help="不使用角色人设缓存")
     parser.add_argument("--debug", action="store_true", help="启用调试模式")
     
     args = parser.parse_args()
@@ -336,7 +730,8 @@ def main():
     
     try:
         # 创建角色对话生成器实例
-        generator = RolePlayGenerator(api_key=api_key)
+        cache_dir = None if args.no_cache else RolePlayGenerator.DEFAULT_CACHE_DIR
+        generator = RolePlayGenerator(api_key=api_key, cache_dir=cache_dir)
         
         # 从命令行参数获取角色人设
         character1 = args.char1
@@ -345,24 +740,30 @@ def main():
         # 如果提供了文本文件且未提供角色人设，则根据文本生成角色人设
         if args.text_file and not (character1 and character2):
             try:
-                # 读取文本文件
-                with open(args.text_file, 'r', encoding='utf-8') as f:
-                    text = f.read()
+                # 一次性读取文本文件，两个角色的生成任务共用同一个字符串对象
+                text = Path(args.text_file).read_text(encoding='utf-8')
+                
+                # 两个角色的人设生成互不依赖，并发调用API以节省等待时间
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    # 生成角色1的人设
+                    if not character1:
+                        print("正在生成角色1的人设...")
+                        future1 = executor.submit(generator.generate_character_profile, text, character_name=args.name1)
                     
-                # 生成角色1的人设
+                    # 生成角色2的人设
+                    if not character2:
+                        print("正在生成角色2的人设...")
+                        # 为角色2生成不同的名称，避免与角色1重名
+                        char2_name = args.name2
+                        if not char2_name and args.name1:
+                            char2_name = "另一个角色"  # 如果只指定了角色1的名称，为角色2设置一个默认值
+                        future2 = executor.submit(generator.generate_character_profile, text, character_name=char2_name)
+                
                 if not character1:
-                    print("正在生成角色1的人设...")
-                    character1 = generator.generate_character_profile(text, character_name=args.name1)
+                    character1 = future1.result()
                     print(f"角色1人设:\n{character1}\n")
-                
-                # 生成角色2的人设
                 if not character2:
-                    print("正在生成角色2的人设...")
-                    # 为角色2生成不同的名称，避免与角色1重名
-                    char2_name = args.name2
-                    if not char2_name and args.name1:
-                        char2_name = "另一个角色"  # 如果只指定了角色1的名称，为角色2设置一个默认值
-                    character2 = generator.generate_character_profile(text, character_name=char2_name)
+                    character2 = future2.result()
                     print(f"角色2人设:\n{character2}\n")
             except Exception as e:
                 print(f"读取文件或生成人设时出错: {e}")
@@ -379,11 +780,14 @@ def main():
             """
             
             print("使用示例文本生成角色人设...")
-            # 使用红楼梦中的角色名称
-            character1 = generator.generate_character_profile(example_text, character_name="贾母")
+            # 使用红楼梦中的角色名称，两个角色并发生成
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                future1 = executor.submit(generator.generate_character_profile, example_text, character_name="贾母")
+                future2 = executor.submit(generator.generate_character_profile, example_text, character_name="刘姥姥")
+            character1 = future1.result()
             print(f"角色1人设:\n{character1}\n")
             
-            character2 = generator.generate_character_profile(example_text, character_name="刘姥姥")
+            character2 = future2.result()
             print(f"角色2人设:\n{character2}\n")
         
         # 生成对话